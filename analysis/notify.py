@@ -8,13 +8,19 @@ Invia notifiche per le idee di business più promettenti tramite Telegram.
 
 import os
 import sys
-import json
+import asyncio
 from pathlib import Path
 from typing import List, Dict, Any
 
+# Calcolo vettoriale
+import numpy as np
+
+# Parsing JSON veloce
+import orjson
+
 # Telegram Bot
-from telegram import Bot
 from telegram.error import TelegramError
+from telegram.ext import AIORateLimiter, ApplicationBuilder
 
 # Logging
 from loguru import logger
@@ -42,6 +48,9 @@ class NotificationManager:
         self.telegram_enabled = self.config.get("telegram", {}).get("enabled", False)
         self.min_score = self.config.get("telegram", {}).get("min_score_to_notify", 80)
         
+        # Connessione al database aperta solo al primo utilizzo
+        self._db = None
+        
         # Inizializza il bot Telegram se abilitato
         if self.telegram_enabled:
             self._init_telegram_bot()
@@ -61,13 +70,37 @@ class NotificationManager:
                 self.telegram_enabled = False
                 return
             
-            self.bot = Bot(token=token)
+            # Il rate limiter gestisce i limiti di Telegram (30 msg/s globali) e i retry sui 429
+            self.app = ApplicationBuilder() \
+                .token(token) \
+                .rate_limiter(AIORateLimiter(overall_max_rate=30, max_retries=3)) \
+                .build()
+            self.bot = self.app.bot
             logger.info("Bot Telegram inizializzato")
             
         except Exception as e:
             logger.error(f"Errore nell'inizializzazione del bot Telegram: {str(e)}")
             self.telegram_enabled = False
     
+    def _db_manager(self):
+        """
+        Restituisce il database manager, creandolo al primo utilizzo.
+        
+        Returns:
+            Istanza di DatabaseManager condivisa tra le chiamate
+        """
+        if self._db is None:
+            self._db = DatabaseManager()
+        return self._db
+    
+    def close(self):
+        """
+        Chiude la connessione al database, se aperta.
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+    
     def _format_idea_message(self, idea):
         """
         Formatta un'idea per l'invio come messaggio Telegram.
@@ -80,9 +113,10 @@ class NotificationManager:
         """
         analysis = idea.get("analysis", {})
         
-        # Formatta i tag
-        tags = analysis.get("tags", [])
-        tags_str = " ".join([f"#{tag.replace(' ', '_')}" for tag in tags])
+        # Formatta i tag (già precalcolati in fase di analisi)
+        tags_str = analysis.get("_tag_str")
+        if tags_str is None:
+            tags_str = " ".join([f"#{tag.replace(' ', '_')}" for tag in analysis.get("tags", [])])
         
         # Crea il messaggio
         message = f"""🚀 *Nuova Idea Promettente!*
@@ -103,33 +137,58 @@ class NotificationManager:
         
         return message
     
-    def send_telegram_notification(self, idea):
+    def _format_digest(self, ideas, max_length=4000):
         """
-        Invia una notifica Telegram per un'idea.
+        Raggruppa più idee in messaggi Telegram entro il limite di lunghezza.
         
         Args:
-            idea: Idea da notificare
+            ideas: Idee da includere nel riepilogo
+            max_length: Lunghezza massima di ogni messaggio (limite Telegram 4096)
             
         Returns:
-            True se l'invio è riuscito, False altrimenti
+            Lista di tuple (messaggio, numero di idee incluse)
         """
-        if not self.telegram_enabled:
-            logger.warning("Notifiche Telegram disabilitate")
-            return False
+        separator = "\n\n———\n\n"
+        digests = []
+        current = ""
+        count = 0
         
-        try:
-            # Formatta il messaggio
-            message = self._format_idea_message(idea)
+        for idea in ideas:
+            message = self._format_idea_message(idea)[:max_length]
+            
+            # Inizia un nuovo messaggio se quello corrente supererebbe il limite
+            if current and len(current) + len(separator) + len(message) > max_length:
+                digests.append((current, count))
+                current = ""
+                count = 0
+            
+            current = f"{current}{separator}{message}" if current else message
+            count += 1
+        
+        if current:
+            digests.append((current, count))
+        
+        return digests
+    
+    async def _send_telegram_message(self, text, disable_web_page_preview=False):
+        """
+        Invia un messaggio Telegram. Il rate limiter del bot accoda gli invii
+        per rispettare i limiti di Telegram invece di ricevere errori 429.
+        
+        Args:
+            text: Testo del messaggio
+            disable_web_page_preview: Disabilita l'anteprima dei link
             
-            # Invia il messaggio
-            self.bot.send_message(
+        Returns:
+            True se l'invio è riuscito, False altrimenti
+        """
+        try:
+            await self.bot.send_message(
                 chat_id=self.chat_id,
-                text=message,
+                text=text,
                 parse_mode="Markdown",
-                disable_web_page_preview=False
+                disable_web_page_preview=disable_web_page_preview
             )
-            
-            logger.success(f"Notifica inviata per: {idea.get('title', 'Idea senza titolo')}")
             return True
             
         except TelegramError as e:
@@ -139,6 +198,92 @@ class NotificationManager:
             logger.error(f"Errore nell'invio della notifica: {str(e)}")
             return False
     
+    async def send_telegram_notification(self, idea):
+        """
+        Invia una notifica Telegram per un'idea.
+        
+        Args:
+            idea: Idea da notificare
+            
+        Returns:
+            True se l'invio è riuscito, False altrimenti
+        """
+        if not self.telegram_enabled:
+            logger.warning("Notifiche Telegram disabilitate")
+            return False
+        
+        if not await self._send_telegram_message(self._format_idea_message(idea)):
+            return False
+        
+        logger.success(f"Notifica inviata per: {idea.get('title', 'Idea senza titolo')}")
+        return True
+    
+    async def send_telegram_digest(self, ideas):
+        """
+        Invia un riepilogo Telegram con più idee per messaggio.
+        
+        Args:
+            ideas: Idee da notificare
+            
+        Returns:
+            Numero di idee notificate
+        """
+        if not self.telegram_enabled:
+            logger.warning("Notifiche Telegram disabilitate")
+            return 0
+        
+        digests = self._format_digest(ideas)
+        
+        # Parti inviate una alla volta, così arrivano nell'ordine corretto.
+        # Anteprime disabilitate per non consumare il limite del messaggio
+        sent_count = 0
+        for message, count in digests:
+            if await self._send_telegram_message(message, disable_web_page_preview=True):
+                sent_count += count
+                logger.success(f"Riepilogo inviato con {count} idee")
+        
+        return sent_count
+    
+    async def _notify_async(self, ideas):
+        """
+        Inizializza il bot e invia il riepilogo delle idee.
+        
+        Args:
+            ideas: Idee da notificare
+            
+        Returns:
+            Numero di idee notificate
+        """
+        async with self.bot:
+            return await self.send_telegram_digest(ideas)
+    
+    def _select_top_ideas(self, ideas, limit):
+        """
+        Seleziona le idee con il punteggio più alto sopra la soglia di notifica.
+        
+        Args:
+            ideas: Lista di idee
+            limit: Numero massimo di idee da selezionare
+            
+        Returns:
+            Lista di idee ordinate per punteggio decrescente
+        """
+        # Estrai i punteggi in un array contiguo per filtrare e selezionare in modo vettoriale
+        scores = np.fromiter((idea.get("analysis", {}).get("score", 0) for idea in ideas),
+                             dtype=np.int16, count=len(ideas))
+        
+        # Filtra le idee con punteggio sufficiente
+        candidates = np.nonzero(scores >= self.min_score)[0]
+        
+        # Limita il numero di notifiche alle idee con il punteggio più alto
+        if candidates.size > limit:
+            candidates = np.sort(candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]])
+        
+        # Ordine per punteggio decrescente, a parità di punteggio resta l'ordine originale
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        
+        return [ideas[i] for i in candidates]
+    
     def notify_top_ideas(self, ideas=None, limit=5):
         """
         Notifica le idee più promettenti.
@@ -150,32 +295,24 @@ class NotificationManager:
         Returns:
             Numero di notifiche inviate
         """
-        # Se non sono state fornite idee, recuperale dal database
         if ideas is None:
-            db_manager = DatabaseManager()
-            ideas = db_manager.get_top_ideas(limit=limit, min_score=self.min_score)
-            db_manager.close()
+            # Il database restituisce già le idee filtrate per punteggio e ordinate
+            ideas_to_notify = self._db_manager().get_top_ideas(limit=limit, min_score=self.min_score)
+        elif ideas:
+            ideas_to_notify = self._select_top_ideas(ideas, limit)
+        else:
+            ideas_to_notify = []
         
-        if not ideas:
-            logger.info("Nessuna idea da notificare")
+        if not ideas_to_notify:
+            logger.info(f"Nessuna idea con punteggio >= {self.min_score} da notificare")
             return 0
         
-        # Filtra le idee con punteggio sufficiente
-        high_score_ideas = [idea for idea in ideas 
-                           if idea.get("analysis", {}).get("score", 0) >= self.min_score]
-        
-        if not high_score_ideas:
-            logger.info(f"Nessuna idea con punteggio >= {self.min_score}")
+        if not self.telegram_enabled:
+            logger.warning("Notifiche Telegram disabilitate")
             return 0
         
-        # Limita il numero di notifiche
-        ideas_to_notify = high_score_ideas[:limit]
-        
-        # Invia le notifiche
-        sent_count = 0
-        for idea in ideas_to_notify:
-            if self.send_telegram_notification(idea):
-                sent_count += 1
+        # Invia le notifiche raggruppate nel minor numero possibile di messaggi
+        sent_count = asyncio.run(self._notify_async(ideas_to_notify))
         
         logger.info(f"Inviate {sent_count}/{len(ideas_to_notify)} notifiche")
         return sent_count
@@ -203,12 +340,12 @@ def main():
             notifier.notify_top_ideas()
             return
         
-        # Ordina per data di modifica (più recente prima)
-        latest_file = str(sorted(relevant_files, key=lambda x: x.stat().st_mtime, reverse=True)[0])
+        # Il nome contiene il timestamp: il massimo lessicografico è il file più recente
+        latest_file = str(max(relevant_files, key=lambda x: x.name))
         
         # Carica le idee rilevanti
-        with open(latest_file, "r", encoding="utf-8") as f:
-            relevant_ideas = json.load(f)
+        with open(latest_file, "rb") as f:
+            relevant_ideas = orjson.loads(f.read())
         
         logger.info(f"Caricate {len(relevant_ideas)} idee rilevanti da {latest_file}")
         
@@ -219,6 +356,10 @@ def main():
         
     except Exception as e:
         logger.error(f"Errore durante l'invio delle notifiche: {str(e)}")
+    
+    finally:
+        # Chiudi la connessione al database
+        notifier.close()
 
 
 if __name__ == "__main__":
@@ -7,20 +7,26 @@ Elabora le idee raccolte dagli scraper, esegue deduplicazione e analisi tramite
 """
 
 import os
+import re
 import sys
 import json
-import time
 import hashlib
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from concurrent.futures import ThreadPoolExecutor
 
+# Serializzazione JSON veloce per i file di output e parsing in streaming dell'input
+import ijson
+import orjson
+
 # Fuzzy matching per deduplicazione
-from fuzzywuzzy import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 
 # Client Ollama per LLM
 import requests
+from requests.adapters import HTTPAdapter
 
 # Logging
 from loguru import logger
@@ -28,11 +34,56 @@ from loguru import logger
 # Configurazione
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 from config.settings import LLM_CONFIG, DATA_DIR
+from database.store import DatabaseManager
 
 # Assicurati che le directory esistano
 Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
 Path(os.path.join(DATA_DIR, "processed")).mkdir(parents=True, exist_ok=True)
 
+# Pool per la scrittura dei file di output in background
+_io_pool = ThreadPoolExecutor(max_workers=2)
+
+# Articoli ignorati all'inizio del titolo quando si sceglie il gruppo di deduplicazione
+_LEADING_STOPWORDS = frozenset({
+    "a", "an", "the",
+    "il", "lo", "la", "i", "gli", "le", "l", "un", "uno", "una",
+})
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _bucket_key(title):
+    """
+    Calcola il gruppo di deduplicazione di un titolo: la prima parola significativa,
+    in minuscolo e senza punteggiatura, saltando gli articoli iniziali.
+    
+    Args:
+        title: Titolo dell'idea
+        
+    Returns:
+        Chiave del gruppo (stringa vuota se il titolo non contiene parole significative)
+    """
+    for word in _WORD_RE.findall(title.lower()):
+        if word not in _LEADING_STOPWORDS:
+            return word
+    return ""
+
+
+def _write_json(file_path, data):
+    """
+    Scrive i dati in un file JSON in modo atomico (file temporaneo + rename).
+    
+    Args:
+        file_path: Percorso del file di destinazione
+        data: Dati da serializzare
+    """
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, file_path)
+    
+    logger.info(f"Risultati salvati in: {file_path}")
+
 
 class IdeaProcessor:
     """
@@ -40,6 +91,28 @@ class IdeaProcessor:
     Gestisce deduplicazione, batch processing e analisi LLM.
     """
     
+    # Margine sui cutoff della deduplicazione: servono solo a scartare in anticipo le coppie,
+    # e gli arrotondamenti non devono escludere quelle che raggiungono la soglia esatta
+    _SCORE_EPS = 1e-6
+    
+    # Template del prompt: solo titolo, descrizione e fonte cambiano tra le idee
+    _PROMPT_TMPL = """Analizza la seguente idea di business/prodotto:
+
+Titolo: {title}
+Descrizione: {description}
+Fonte: {source}
+
+Rispondi SOLO in formato JSON con questi campi:
+{{
+  "score": [punteggio da 0-100 basato su originalità, fattibilità, potenziale di mercato],
+  "tags": [massimo 3 tag/categorie che descrivono l'idea],
+  "summary": [sintesi concisa in 1-2 frasi],
+  "difficulty": ["low", "medium", "high"],
+  "market_potential": ["niche", "moderate", "large"],
+  "insight": [breve analisi del potenziale di business e suggerimenti]
+}}
+"""
+    
     def __init__(self, config=None):
         """
         Inizializza il processor con la configurazione specificata.
@@ -52,6 +125,29 @@ class IdeaProcessor:
         self.batch_size = self.config.get("batch_size", 5)
         self.similarity_threshold = self.config.get("similarity_threshold", 0.85)
         self.min_score_threshold = self.config.get("min_score_threshold", 65)
+        self.request_timeout = self.config.get("request_timeout", 120)
+        self.use_cache = self.config.get("cache_analyses", True)
+        self.max_input_chars = self.config.get("max_input_chars", 1500)
+        
+        # Cache delle analisi già eseguite, indicizzata per hash del contenuto
+        self._cache = {}
+        
+        # Scritture dei file di output ancora in corso
+        self._pending_writes = []
+        
+        # Parametri fissi delle richieste a Ollama, a cui si aggiunge solo il prompt
+        self._req_base = {
+            "model": self.model,
+            "temperature": self.config.get("temperature", 0.3),
+            "max_tokens": self.config.get("max_tokens", 500),
+            "stream": False,
+            "format": "json"  # Ollama restituisce solo JSON valido, senza testo attorno
+        }
+        
+        # Sessione HTTP persistente: le chiamate a Ollama riusano le stesse connessioni
+        self._http = requests.Session()
+        self._http.headers.update({"Content-Type": "application/json"})
+        self._http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=self.batch_size))
         
         # Verifica che Ollama sia disponibile
         self._check_ollama_availability()
@@ -64,7 +160,7 @@ class IdeaProcessor:
         """
         try:
             # Verifica che Ollama sia in esecuzione
-            response = requests.get("http://localhost:11434/api/tags")
+            response = self._http.get("http://localhost:11434/api/tags", timeout=5)
             if response.status_code != 200:
                 logger.warning("Ollama non sembra essere in esecuzione. Assicurati che sia avviato.")
                 return
@@ -99,15 +195,28 @@ class IdeaProcessor:
                 logger.error("Nessun file di idee grezze trovato")
                 return []
             
-            # Ordina per data di modifica (più recente prima)
-            file_path = str(sorted(data_files, key=lambda x: x.stat().st_mtime, reverse=True)[0])
+            # Il nome contiene il timestamp: il massimo lessicografico è il file più recente
+            file_path = str(max(data_files, key=lambda x: x.name))
         
         logger.info(f"Caricamento idee da: {file_path}")
         
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                ideas = json.load(f)
-            logger.info(f"Caricate {len(ideas)} idee grezze")
+            ideas = []
+            seen_hashes = set()
+            total = 0
+            
+            # Lettura in streaming: la deduplicazione per hash avviene durante il parsing,
+            # senza materializzare in memoria l'intero file
+            with open(file_path, "rb") as f:
+                for idea in ijson.items(f, "item", use_float=True):
+                    total += 1
+                    idea_hash = idea.get("hash")
+                    if not idea_hash or idea_hash in seen_hashes:
+                        continue
+                    seen_hashes.add(idea_hash)
+                    ideas.append(idea)
+            
+            logger.info(f"Caricate {total} idee grezze, {len(ideas)} dopo deduplicazione per hash")
             return ideas
         except Exception as e:
             logger.error(f"Errore nel caricamento delle idee: {str(e)}")
@@ -118,7 +227,7 @@ class IdeaProcessor:
         Rimuove idee duplicate utilizzando fuzzy matching.
         
         Args:
-            ideas: Lista di idee da deduplicare
+            ideas: Lista di idee da deduplicare, già uniche per hash
             
         Returns:
             Lista di idee uniche
@@ -128,41 +237,115 @@ class IdeaProcessor:
         
         logger.info(f"Deduplicazione di {len(ideas)} idee")
         
-        # Prima deduplicazione basata su hash
-        hash_map = {}
-        for idea in ideas:
-            idea_hash = idea.get("hash")
-            if idea_hash and idea_hash not in hash_map:
-                hash_map[idea_hash] = idea
-        
-        # Lista di idee dopo deduplicazione per hash
-        hash_deduped = list(hash_map.values())
-        logger.info(f"Dopo deduplicazione per hash: {len(hash_deduped)} idee")
-        
-        # Seconda deduplicazione basata su fuzzy matching
-        unique_ideas = []
-        for idea in hash_deduped:
-            # Controlla se l'idea è simile a una già presente
-            is_duplicate = False
-            for unique_idea in unique_ideas:
-                # Calcola similarità tra titoli e descrizioni
-                title_similarity = fuzz.ratio(idea.get("title", ""), unique_idea.get("title", ""))
-                desc_similarity = fuzz.ratio(idea.get("description", "")[:200], 
-                                           unique_idea.get("description", "")[:200])
-                
-                # Media ponderata (titolo ha più peso)
-                similarity = (title_similarity * 0.7) + (desc_similarity * 0.3)
+        # Deduplicazione basata su fuzzy matching (quella per hash avviene al caricamento)
+        titles = [idea.get("title", "") for idea in ideas]
+        descs = [idea.get("description", "")[:200] for idea in ideas]
+        
+        # Soglia minima del titolo oltre la quale una coppia può ancora raggiungere la soglia
+        # complessiva: sotto questo valore rapidfuzz restituisce 0 senza completare il calcolo
+        threshold = self.similarity_threshold * 100
+        title_cutoff = max(0.0, (threshold - 30) / 0.7 - self._SCORE_EPS)
+        
+        title_lens = [len(title) for title in titles]
+        
+        # Le idee vengono confrontate solo con quelle già tenute dello stesso gruppo,
+        # individuato dalla prima parola significativa del titolo. È un compromesso:
+        # due titoli simili la cui prima parola significativa differisce (es. un refuso
+        # o un sinonimo) finiscono in gruppi diversi e non vengono più confrontati
+        buckets = {}
+        kept = []
+        for i, title in enumerate(titles):
+            # Titoli, descrizioni e lunghezze delle idee tenute nel gruppo, in liste parallele
+            bucket_titles, bucket_descs, bucket_lens = buckets.setdefault(_bucket_key(title), ([], [], []))
+            title_len = title_lens[i]
+            
+            if bucket_titles:
+                # Filtro sulla lunghezza: 200 * min / (la + lb) è il massimo ratio
+                # ottenibile tra due titoli, scarta le coppie che non possono essere simili
+                lens = np.array(bucket_lens)
+                total = lens + title_len
+                max_ratio = np.where(total > 0, 200 * np.minimum(lens, title_len) / np.maximum(total, 1), 100)
+                mask = max_ratio >= title_cutoff
                 
-                if similarity >= (self.similarity_threshold * 100):
-                    is_duplicate = True
-                    break
+                if mask.any():
+                    # Le liste del gruppo vengono ricostruite solo se il filtro ha scartato qualcosa
+                    if mask.all():
+                        cand_titles, cand_descs = bucket_titles, bucket_descs
+                    else:
+                        selected = np.flatnonzero(mask)
+                        cand_titles = [bucket_titles[k] for k in selected]
+                        cand_descs = [bucket_descs[k] for k in selected]
+                    
+                    # float64 come fuzz.ratio: con il float32 predefinito la media
+                    # ponderata si discosterebbe da quella calcolata coppia per coppia
+                    title_scores = process.cdist([title], cand_titles, scorer=fuzz.ratio,
+                                                 score_cutoff=title_cutoff, dtype=np.float64)[0]
+                    
+                    # Media ponderata (titolo ha più peso): per ogni titolo simile la descrizione
+                    # deve raggiungere il punteggio mancante alla soglia, usato come score_cutoff
+                    # così rapidfuzz interrompe il calcolo appena non è più raggiungibile.
+                    # La decisione usa la stessa media ponderata del confronto completo.
+                    # I candidati con il titolo più simile vengono provati per primi
+                    is_duplicate = False
+                    for k in np.argsort(-title_scores):
+                        title_score = title_scores[k]
+                        if not title_score:
+                            break
+                        
+                        pair_cutoff = max(0.0, (threshold - title_score * 0.7) / 0.3 - self._SCORE_EPS)
+                        desc_score = fuzz.ratio(descs[i], cand_descs[k], score_cutoff=pair_cutoff)
+                        if title_score * 0.7 + desc_score * 0.3 >= threshold:
+                            is_duplicate = True
+                            break
+                    
+                    if is_duplicate:
+                        continue
             
-            if not is_duplicate:
-                unique_ideas.append(idea)
+            bucket_titles.append(title)
+            bucket_descs.append(descs[i])
+            bucket_lens.append(title_len)
+            kept.append(i)
+        
+        unique_ideas = [ideas[i] for i in kept]
         
         logger.success(f"Dopo deduplicazione fuzzy: {len(unique_ideas)} idee uniche")
         return unique_ideas
     
+    def _idea_key(self, idea):
+        """
+        Calcola la chiave di cache di un'idea.
+        
+        Args:
+            idea: Idea di cui calcolare la chiave
+            
+        Returns:
+            Hash del contenuto dell'idea
+        """
+        return idea.get("hash") or hashlib.sha256(
+            f"{idea.get('title', '')}{idea.get('description', '')}".encode()
+        ).hexdigest()
+    
+    def _load_cached_analyses(self, ideas):
+        """
+        Carica dal database, con un'unica interrogazione, le analisi già eseguite per le idee.
+        
+        Args:
+            ideas: Lista di idee da processare
+        """
+        if not self.use_cache:
+            return
+        
+        try:
+            db_manager = DatabaseManager()
+            try:
+                self._cache.update(db_manager.get_analyses_by_hash([self._idea_key(idea) for idea in ideas]))
+            finally:
+                db_manager.close()
+        except Exception as e:
+            logger.warning(f"Impossibile caricare le analisi esistenti: {str(e)}")
+        
+        logger.info(f"Analisi già disponibili in cache: {len(self._cache)}")
+    
     def _analyze_idea_with_llm(self, idea):
         """
         Analizza una singola idea utilizzando il LLM.
@@ -173,35 +356,25 @@ class IdeaProcessor:
         Returns:
             Idea con analisi LLM aggiunta
         """
+        # Riusa l'analisi se l'idea è già stata analizzata
+        key = self._idea_key(idea)
+        if key in self._cache:
+            idea["analysis"] = self._cache[key]
+            return idea
+        
         # Prepara il prompt per il LLM
-        prompt = f"""Analizza la seguente idea di business/prodotto:
-
-Titolo: {idea.get('title', '')}
-Descrizione: {idea.get('description', '')}
-Fonte: {idea.get('source', '')}
-
-Rispondi SOLO in formato JSON con questi campi:
-{{
-  "score": [punteggio da 0-100 basato su originalità, fattibilità, potenziale di mercato],
-  "tags": [massimo 3 tag/categorie che descrivono l'idea],
-  "summary": [sintesi concisa in 1-2 frasi],
-  "difficulty": ["low", "medium", "high"],
-  "market_potential": ["niche", "moderate", "large"],
-  "insight": [breve analisi del potenziale di business e suggerimenti]
-}}
-"""
+        prompt = self._PROMPT_TMPL.format(
+            title=idea.get("title", ""),
+            description=(idea.get("description", "") or "")[:self.max_input_chars],
+            source=idea.get("source", "")
+        )
         
         try:
             # Chiamata a Ollama API
-            response = requests.post(
+            response = self._http.post(
                 "http://localhost:11434/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "temperature": self.config.get("temperature", 0.3),
-                    "max_tokens": self.config.get("max_tokens", 500),
-                    "stream": False
-                }
+                json={**self._req_base, "prompt": prompt},
+                timeout=self.request_timeout
             )
             
             if response.status_code != 200:
@@ -211,28 +384,29 @@ Rispondi SOLO in formato JSON con questi campi:
             # Estrai il testo della risposta
             llm_response = response.json().get("response", "")
             
-            # Estrai il JSON dalla risposta
+            # Con format=json la risposta è già un documento JSON
             try:
-                # Trova l'inizio e la fine del JSON nella risposta
-                json_start = llm_response.find("{")
-                json_end = llm_response.rfind("}")
+                analysis = json.loads(llm_response)
                 
-                if json_start >= 0 and json_end > json_start:
-                    json_str = llm_response[json_start:json_end+1]
-                    analysis = json.loads(json_str)
+                if isinstance(analysis, dict):
+                    # Precalcola gli hashtag usati nelle notifiche, così viaggiano con l'analisi
+                    tags = analysis.get("tags", [])
+                    analysis["_tag_str"] = " ".join(
+                        f"#{tag.replace(' ', '_')}" for tag in tags if isinstance(tag, str)
+                    ) if isinstance(tags, list) else ""
                     
                     # Aggiungi l'analisi all'idea
                     idea["analysis"] = analysis
+                    self._cache[key] = analysis
                     
                     # Aggiungi timestamp dell'analisi
                     idea["analysis_timestamp"] = datetime.now().isoformat()
                     
                     logger.info(f"Idea analizzata: '{idea.get('title', '')[:30]}...' - Score: {analysis.get('score', 'N/A')}")
                 else:
-                    logger.warning(f"Impossibile trovare JSON nella risposta LLM")
+                    logger.debug(f"Risposta LLM non valida: {llm_response}")
             except json.JSONDecodeError as e:
-                logger.error(f"Errore nel parsing JSON dalla risposta LLM: {str(e)}")
-                logger.debug(f"Risposta LLM: {llm_response}")
+                logger.debug(f"Errore nel parsing JSON dalla risposta LLM: {str(e)} - Risposta: {llm_response}")
         
         except Exception as e:
             logger.error(f"Errore nell'analisi dell'idea: {str(e)}")
@@ -249,19 +423,10 @@ Rispondi SOLO in formato JSON con questi campi:
         Returns:
             Batch di idee processate
         """
-        processed_batch = []
-        
-        for idea in ideas_batch:
-            try:
-                processed_idea = self._analyze_idea_with_llm(idea)
-                processed_batch.append(processed_idea)
-                # Pausa tra le chiamate LLM
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"Errore nel processing dell'idea: {str(e)}")
-                processed_batch.append(idea)  # Aggiungi l'idea non processata
-        
-        return processed_batch
+        # Le chiamate a Ollama sono I/O-bound: le idee del batch vengono analizzate in parallelo.
+        # _analyze_idea_with_llm gestisce già gli errori restituendo l'idea non processata
+        with ThreadPoolExecutor(max_workers=self.batch_size) as executor:
+            return list(executor.map(self._analyze_idea_with_llm, ideas_batch))
     
     def process_ideas(self, input_file=None):
         """
@@ -281,6 +446,9 @@ Rispondi SOLO in formato JSON con questi campi:
         # Deduplicazione
         unique_ideas = self._deduplicate_ideas(raw_ideas)
         
+        # Recupera le analisi già eseguite nelle esecuzioni precedenti
+        self._load_cached_analyses(unique_ideas)
+        
         # Dividi in batch per il processing
         batches = [unique_ideas[i:i+self.batch_size] 
                   for i in range(0, len(unique_ideas), self.batch_size)]
@@ -302,23 +470,31 @@ Rispondi SOLO in formato JSON con questi campi:
         
         logger.success(f"Processing completato. {len(relevant_ideas)}/{len(all_processed)} idee rilevanti")
         
-        # Salva i risultati
+        # Salva i risultati in background, senza bloccare il chiamante
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Salva tutte le idee processate
         processed_file = os.path.join(DATA_DIR, "processed", f"processed_ideas_{timestamp}.json")
-        with open(processed_file, "w", encoding="utf-8") as f:
-            json.dump(all_processed, f, ensure_ascii=False, indent=2)
+        self._pending_writes.append(_io_pool.submit(_write_json, processed_file, all_processed))
         
         # Salva solo le idee rilevanti
         if relevant_ideas:
             relevant_file = os.path.join(DATA_DIR, "processed", f"relevant_ideas_{timestamp}.json")
-            with open(relevant_file, "w", encoding="utf-8") as f:
-                json.dump(relevant_ideas, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"Risultati salvati in: {processed_file}")
+            self._pending_writes.append(_io_pool.submit(_write_json, relevant_file, relevant_ideas))
         
         return all_processed, relevant_ideas
+    
+    def wait_for_writes(self):
+        """
+        Attende il completamento delle scritture dei file di output.
+        """
+        for future in self._pending_writes:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Errore nel salvataggio dei risultati: {str(e)}")
+        
+        self._pending_writes = []
 
 
 def main():
@@ -335,6 +511,9 @@ def main():
     
     logger.info(f"Analisi completata. {len(relevant_ideas)}/{len(all_ideas)} idee rilevanti")
     
+    # Assicurati che i file di output siano scritti prima di terminare
+    processor.wait_for_writes()
+    
     return relevant_ideas
 
 
@@ -31,7 +31,12 @@ SCRAPER_CONFIG = {
             "subreddits": ["SaaS", "microsaas", "SomeoneShouldMake", "Entrepreneur", "startups"],
             "time_filter": "week",
             "limit": 100,
-            "min_score": 10
+            "min_score": 10,
+            "max_workers": 8,  # Subreddit raccolti in parallelo
+            "include_comments": True,  # Aggiunge i commenti principali alla descrizione
+            "cache_path": os.path.join(DATA_DIR, "cache", "reddit.db"),  # Cache delle risposte
+            "listing_ttl": 900,  # Secondi di validità delle classifiche in cache
+            "comments_ttl": 3600  # Secondi di validità dei commenti in cache
         }
     },
     "HackerNews": {
@@ -62,8 +67,11 @@ LLM_CONFIG = {
     "batch_size": 5,  # Numero di idee da processare in batch
     "temperature": 0.3,  # Temperatura per la generazione
     "max_tokens": 500,  # Massimo numero di token per risposta
+    "max_input_chars": 1500,  # Caratteri massimi della descrizione inviati al LLM
+    "request_timeout": 120,  # Timeout in secondi per ogni chiamata a Ollama
     "similarity_threshold": 0.85,  # Soglia per deduplicazione (0-1)
-    "min_score_threshold": 65  # Punteggio minimo per archiviazione permanente
+    "min_score_threshold": 65,  # Punteggio minimo per archiviazione permanente
+    "cache_analyses": True  # Riusa le analisi già archiviate per le idee con lo stesso hash
 }
 
 # Configurazione database
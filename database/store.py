@@ -8,14 +8,19 @@ Gestisce l'archiviazione delle idee analizzate nel database (Supabase o SQLite).
 
 import os
 import sys
-import json
 import sqlite3
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+# Serializzazione JSON veloce e parsing in streaming dell'input
+import ijson
+import orjson
 
 # Supabase client
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 
 # Logging
 from loguru import logger
@@ -27,6 +32,38 @@ from config.settings import DB_CONFIG, DATA_DIR
 # Assicurati che le directory esistano
 Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
 
+# Client Supabase condiviso: le connessioni HTTP keep-alive vengono riusate tra le istanze
+_SUPABASE_CLIENT: Optional[Client] = None
+
+# Database SQLite il cui schema è già stato creato da questo processo
+_SCHEMA_READY = set()
+
+# Numero di idee lette dal file e archiviate per ogni blocco in main()
+STORE_BATCH_SIZE = 500
+
+
+def _get_supabase(supabase_url, supabase_key):
+    """
+    Restituisce il client Supabase condiviso, creandolo al primo utilizzo.
+    
+    Args:
+        supabase_url: URL del progetto Supabase
+        supabase_key: Chiave API di Supabase
+        
+    Returns:
+        Client Supabase
+    """
+    global _SUPABASE_CLIENT
+    
+    if _SUPABASE_CLIENT is None:
+        _SUPABASE_CLIENT = create_client(
+            supabase_url,
+            supabase_key,
+            options=ClientOptions(postgrest_client_timeout=30)
+        )
+    
+    return _SUPABASE_CLIENT
+
 
 class DatabaseManager:
     """
@@ -34,6 +71,48 @@ class DatabaseManager:
     Supporta sia Supabase che SQLite come backend.
     """
     
+    # Statement SQLite usati nei percorsi frequenti: il testo è sempre lo stesso,
+    # quindi sqlite3 li prepara una volta sola e li riusa dalla sua cache
+    _SQL_INSERT_RAW = """
+        INSERT INTO raw_ideas 
+        (title, description, url, source, timestamp, hash, raw_content)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(hash) DO NOTHING
+        """
+    
+    # Upsert invece di INSERT OR REPLACE: la riga esistente viene aggiornata
+    # in place e mantiene il suo id, quindi i riferimenti da feedback restano validi
+    _SQL_UPSERT_ANALYZED = """
+        INSERT INTO analyzed_ideas 
+        (title, description, url, source, timestamp, hash, analysis, score, tags, difficulty, market_potential)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(hash) DO UPDATE SET
+            title = excluded.title,
+            description = excluded.description,
+            url = excluded.url,
+            source = excluded.source,
+            timestamp = excluded.timestamp,
+            analysis = excluded.analysis,
+            score = excluded.score,
+            tags = excluded.tags,
+            difficulty = excluded.difficulty,
+            market_potential = excluded.market_potential
+        """
+    
+    _SQL_SELECT_TOP = """
+        SELECT id, title, description, url, source, timestamp, hash,
+               analysis, score, tags, difficulty, market_potential
+        FROM analyzed_ideas 
+        WHERE score >= ? 
+        ORDER BY score DESC 
+        LIMIT ?
+        """
+    
+    _SQL_DELETE_OLD_RAW = """
+        DELETE FROM raw_ideas 
+        WHERE created_at < ?
+        """
+    
     def __init__(self, config=None):
         """
         Inizializza il database manager con la configurazione specificata.
@@ -64,7 +143,11 @@ class DatabaseManager:
                 logger.error("Credenziali Supabase mancanti. Imposta SUPABASE_URL e SUPABASE_KEY")
                 raise ValueError("Credenziali Supabase mancanti")
             
-            self.supabase: Client = create_client(supabase_url, supabase_key)
+            self.supabase: Client = _get_supabase(supabase_url, supabase_key)
+            
+            # Tabelle senza vincolo UNIQUE su hash (migrazione non ancora applicata):
+            # per queste gli upsert vengono sostituiti da inserimenti semplici
+            self._tables_without_hash_key = set()
             logger.info("Connessione a Supabase stabilita")
             
             # Verifica che le tabelle esistano
@@ -81,6 +164,8 @@ class DatabaseManager:
         Verifica che le tabelle necessarie esistano in Supabase.
         Nota: In Supabase, le tabelle devono essere create manualmente o tramite migrations.
         Questo metodo è solo per documentazione della struttura.
+        Il vincolo UNIQUE su hash richiesto dagli upsert si aggiunge alle tabelle esistenti
+        con la migrazione descritta in docs/GUIDA_IMPLEMENTAZIONE.md.
         """
         # Struttura delle tabelle in Supabase:
         # 
@@ -91,7 +176,7 @@ class DatabaseManager:
         # - url: text
         # - source: text
         # - timestamp: timestamptz
-        # - hash: text
+        # - hash: text (unique, usato per gli upsert)
         # - raw_content: jsonb
         # - created_at: timestamptz
         #
@@ -102,7 +187,7 @@ class DatabaseManager:
         # - url: text
         # - source: text
         # - timestamp: timestamptz
-        # - hash: text
+        # - hash: text (unique, usato per gli upsert)
         # - analysis: jsonb
         # - score: integer
         # - tags: text[]
@@ -137,11 +222,30 @@ class DatabaseManager:
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
             
             self.db_path = db_path
-            self.conn = sqlite3.connect(db_path)
+            # Autocommit: le transazioni vengono aperte esplicitamente con BEGIN nei batch di scrittura
+            self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False, cached_statements=256)
             self.conn.row_factory = sqlite3.Row
             
-            # Crea le tabelle se non esistono
-            self._create_sqlite_tables()
+            # WAL + synchronous=NORMAL evitano un fsync a ogni commit: il database resta
+            # consistente in caso di crash dell'applicazione, ma non di perdita di alimentazione
+            self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-65536;
+            PRAGMA mmap_size=268435456;
+            PRAGMA foreign_keys=ON;
+            """)
+            
+            # Crea le tabelle se non esistono (una sola volta per processo e database).
+            # I PRAGMA invece restano sopra: valgono per la singola connessione
+            schema_key = os.path.abspath(db_path)
+            if schema_key not in _SCHEMA_READY:
+                self._create_sqlite_tables()
+                _SCHEMA_READY.add(schema_key)
+            
+            # Hash delle idee grezze già archiviate, caricati al primo inserimento
+            self._known_raw_hashes = None
             
             logger.info(f"Database SQLite inizializzato: {db_path}")
             
@@ -212,13 +316,115 @@ class DatabaseManager:
         )
         """)
         
-        # Crea indici per migliorare le performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_raw_ideas_hash ON raw_ideas (hash)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyzed_ideas_hash ON analyzed_ideas (hash)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyzed_ideas_score ON analyzed_ideas (score)")
+        # Crea indici per migliorare le performance.
+        # Le colonne hash sono già indicizzate dal vincolo UNIQUE: gli indici
+        # espliciti su hash erano duplicati e rallentavano solo gli insert.
+        cursor.execute("DROP INDEX IF EXISTS idx_raw_ideas_hash")
+        cursor.execute("DROP INDEX IF EXISTS idx_analyzed_ideas_hash")
+        cursor.execute("DROP INDEX IF EXISTS idx_analyzed_ideas_score")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyzed_ideas_score_desc ON analyzed_ideas (score DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_raw_ideas_created_at ON raw_ideas (created_at)")
         
         self.conn.commit()
     
+    def _executemany_sqlite(self, sql, rows, chunk_size=500):
+        """
+        Esegue uno statement su più righe, un blocco alla volta, ognuno in un'unica transazione.
+        
+        Args:
+            sql: Statement SQL parametrizzato
+            rows: Lista di tuple di parametri
+            chunk_size: Numero di righe per transazione
+            
+        Returns:
+            Numero di righe modificate
+        """
+        cursor = self.conn.cursor()
+        count = 0
+        errors = []
+        
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i+chunk_size]
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                cursor.executemany(sql, chunk)
+                count += cursor.rowcount
+                self.conn.commit()
+                
+            except Exception:
+                self.conn.rollback()
+                # Il blocco viene riscritto riga per riga, così solo le righe non valide vengono scartate.
+                # La cache degli hash noti va ricaricata dal database
+                self._known_raw_hashes = None
+                count += self._execute_rows_sqlite(cursor, sql, chunk, errors)
+        
+        self._log_batch_errors(errors, "SQLite")
+        return count
+    
+    def _execute_rows_sqlite(self, cursor, sql, rows, errors):
+        """
+        Esegue uno statement riga per riga in un'unica transazione, con un SAVEPOINT
+        per ogni riga: una riga non valida viene annullata senza perdere le altre.
+        
+        Args:
+            cursor: Cursore SQLite
+            sql: Statement SQL parametrizzato
+            rows: Lista di tuple di parametri
+            errors: Lista a cui aggiungere gli errori, come tuple (righe, errore)
+            
+        Returns:
+            Numero di righe modificate
+        """
+        count = 0
+        
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for row in rows:
+                self.conn.execute("SAVEPOINT riga")
+                try:
+                    cursor.execute(sql, row)
+                    count += cursor.rowcount
+                except Exception as e:
+                    self.conn.execute("ROLLBACK TO riga")
+                    errors.append((1, repr(e)))
+                self.conn.execute("RELEASE riga")
+            self.conn.commit()
+            
+        except Exception as e:
+            self.conn.rollback()
+            errors.append((len(rows), repr(e)))
+            return 0
+        
+        return count
+    
+    @staticmethod
+    def _log_batch_errors(errors, backend):
+        """
+        Registra con un solo messaggio gli errori dei blocchi (o delle singole righe) falliti in un'archiviazione.
+        
+        Args:
+            errors: Lista di tuple (righe non archiviate, errore)
+            backend: Nome del backend, usato nel messaggio
+        """
+        if errors:
+            logger.error(
+                "Errore nell'archiviazione in {}: {} scritture fallite ({} righe); esempi: {}",
+                backend, len(errors), sum(size for size, _ in errors), [err for _, err in errors[:5]]
+            )
+    
+    def _get_known_raw_hashes(self):
+        """
+        Restituisce l'insieme degli hash delle idee grezze già presenti in SQLite,
+        caricandolo dal database al primo utilizzo.
+        
+        Returns:
+            Insieme di hash
+        """
+        if self._known_raw_hashes is None:
+            cursor = self.conn.execute("SELECT hash FROM raw_ideas")
+            self._known_raw_hashes = {row[0] for row in cursor}
+        return self._known_raw_hashes
+    
     def store_raw_ideas(self, ideas):
         """
         Archivia le idee grezze nel database.
@@ -239,36 +445,115 @@ class DatabaseManager:
         else:
             return self._store_raw_ideas_sqlite(ideas)
     
-    def _store_raw_ideas_supabase(self, ideas):
+    def _upsert_supabase(self, table, rows, chunk_size=500, ignore_duplicates=False, max_workers=4):
         """
-        Archivia le idee grezze in Supabase.
+        Inserisce più righe in Supabase con una richiesta per blocco invece che per riga.
+        Con più blocchi le richieste vengono inviate in parallelo sul client condiviso.
         
         Args:
-            ideas: Lista di idee grezze
+            table: Nome della tabella
+            rows: Lista di righe da inserire
+            chunk_size: Numero di righe per richiesta
+            ignore_duplicates: Ignora le righe con hash già presente invece di aggiornarle
+            max_workers: Numero massimo di richieste contemporanee
             
         Returns:
-            Numero di idee archiviate
+            Numero di righe archiviate
         """
-        count = 0
+        errors = []
         
-        for idea in ideas:
+        # Una sola riga per hash: Postgres rifiuta l'intero blocco se un upsert
+        # (ON CONFLICT DO UPDATE) tocca due volte la stessa riga. Aggiornando vale
+        # l'ultima occorrenza, ignorando i duplicati la prima
+        by_hash = {}
+        for row in rows:
+            if ignore_duplicates:
+                by_hash.setdefault(row["hash"], row)
+            else:
+                by_hash[row["hash"]] = row
+        rows = list(by_hash.values())
+        
+        def insert_chunk(chunk):
+            result = self.supabase.table(table).insert(chunk).execute()
+            return len(result.data or [])
+        
+        def upsert_chunk(chunk):
             try:
-                # Converti raw_content in JSON se è una stringa
-                if isinstance(idea.get("raw_content"), str):
-                    try:
-                        idea["raw_content"] = json.loads(idea["raw_content"])
-                    except json.JSONDecodeError:
-                        # Se non è JSON valido, lascialo come stringa
-                        pass
+                if table in self._tables_without_hash_key:
+                    return insert_chunk(chunk)
                 
-                # Inserisci l'idea
-                result = self.supabase.table("raw_ideas").insert(idea).execute()
+                result = self.supabase.table(table) \
+                    .upsert(chunk, on_conflict="hash", ignore_duplicates=ignore_duplicates) \
+                    .execute()
                 
-                if result.data:
-                    count += 1
+                return len(result.data or [])
                 
             except Exception as e:
-                logger.error(f"Errore nell'archiviazione dell'idea grezza in Supabase: {str(e)}")
+                # 42P10: nessun vincolo UNIQUE su hash per ON CONFLICT. Finché la migrazione
+                # non viene applicata le righe vengono inserite come prima, senza upsert
+                if getattr(e, "code", None) == "42P10":
+                    if table not in self._tables_without_hash_key:
+                        self._tables_without_hash_key.add(table)
+                        logger.warning(
+                            f"La tabella {table} non ha un vincolo UNIQUE su hash: uso di inserimenti semplici. "
+                            f"Applica la migrazione in docs/GUIDA_IMPLEMENTAZIONE.md per abilitare gli upsert"
+                        )
+                    try:
+                        return insert_chunk(chunk)
+                    except Exception as insert_error:
+                        e = insert_error
+                
+                # list.append è atomica: sicura anche dai thread del pool
+                errors.append((len(chunk), repr(e)))
+                return 0
+        
+        chunks = [rows[i:i+chunk_size] for i in range(0, len(rows), chunk_size)]
+        if len(chunks) <= 1:
+            count = sum(upsert_chunk(chunk) for chunk in chunks)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                count = sum(executor.map(upsert_chunk, chunks))
+        
+        self._log_batch_errors(errors, f"{table} su Supabase")
+        return count
+    
+    def _store_raw_ideas_supabase(self, ideas):
+        """
+        Archivia le idee grezze in Supabase.
+        
+        Args:
+            ideas: Lista di idee grezze
+            
+        Returns:
+            Numero di idee archiviate
+        """
+        # Timestamp di ripiego calcolato una sola volta per l'intero blocco
+        now_iso = datetime.datetime.now().isoformat()
+        
+        rows = []
+        for idea in ideas:
+            # raw_content arriva come dict dagli scraper; le stringhe JSON
+            # (file prodotti dalle versioni precedenti) vengono decodificate
+            raw_content = idea.get("raw_content", {})
+            if isinstance(raw_content, str):
+                try:
+                    raw_content = orjson.loads(raw_content)
+                except orjson.JSONDecodeError:
+                    # Se non è JSON valido, lascialo come stringa
+                    pass
+            
+            rows.append({
+                "title": idea.get("title", ""),
+                "description": idea.get("description", ""),
+                "url": idea.get("url", ""),
+                "source": idea.get("source", ""),
+                "timestamp": idea.get("timestamp", now_iso),
+                "hash": idea.get("hash", ""),
+                "raw_content": raw_content
+            })
+        
+        # Le idee già presenti (stesso hash) vengono ignorate
+        count = self._upsert_supabase("raw_ideas", rows, ignore_duplicates=True)
         
         logger.success(f"Archiviate {count}/{len(ideas)} idee grezze in Supabase")
         return count
@@ -283,37 +568,37 @@ class DatabaseManager:
         Returns:
             Numero di idee archiviate
         """
-        cursor = self.conn.cursor()
-        count = 0
+        # Scarta subito le idee già archiviate: nelle esecuzioni ripetute sono
+        # la maggior parte e non serve interrogare l'indice UNIQUE per ognuna
+        known_hashes = self._get_known_raw_hashes()
+        new_ideas = [idea for idea in ideas if idea.get("hash", "") not in known_hashes]
         
-        for idea in ideas:
-            try:
-                # Converti raw_content in JSON string se non lo è già
-                if not isinstance(idea.get("raw_content"), str):
-                    idea["raw_content"] = json.dumps(idea["raw_content"])
-                
-                # Inserisci l'idea
-                cursor.execute("""
-                INSERT OR IGNORE INTO raw_ideas 
-                (title, description, url, source, timestamp, hash, raw_content)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    idea.get("title", ""),
-                    idea.get("description", ""),
-                    idea.get("url", ""),
-                    idea.get("source", ""),
-                    idea.get("timestamp", datetime.datetime.now().isoformat()),
-                    idea.get("hash", ""),
-                    idea.get("raw_content", "{}")
-                ))
-                
-                if cursor.rowcount > 0:
-                    count += 1
-                
-            except Exception as e:
-                logger.error(f"Errore nell'archiviazione dell'idea grezza in SQLite: {str(e)}")
+        # Timestamp di ripiego calcolato una sola volta per l'intero blocco
+        now_iso = datetime.datetime.now().isoformat()
+        
+        rows = []
+        for idea in new_ideas:
+            # Converti raw_content in JSON string se non lo è già
+            raw_content = idea.get("raw_content", {})
+            if not isinstance(raw_content, str):
+                raw_content = orjson.dumps(raw_content).decode()
+            
+            rows.append((
+                idea.get("title", ""),
+                idea.get("description", ""),
+                idea.get("url", ""),
+                idea.get("source", ""),
+                idea.get("timestamp", now_iso),
+                idea.get("hash", ""),
+                raw_content
+            ))
+        
+        count = self._executemany_sqlite(self._SQL_INSERT_RAW, rows)
+        
+        # Se un blocco è fallito la cache è stata invalidata e verrà ricaricata
+        if self._known_raw_hashes is not None:
+            self._known_raw_hashes.update(row[5] for row in rows)
         
-        self.conn.commit()
         logger.success(f"Archiviate {count}/{len(ideas)} idee grezze in SQLite")
         return count
     
@@ -354,35 +639,30 @@ class DatabaseManager:
         Returns:
             Numero di idee archiviate
         """
-        count = 0
+        # Timestamp di ripiego calcolato una sola volta per l'intero blocco
+        now_iso = datetime.datetime.now().isoformat()
         
+        rows = []
         for idea in ideas:
-            try:
-                analysis = idea.get("analysis", {})
-                
-                # Prepara i dati per l'inserimento
-                idea_data = {
-                    "title": idea.get("title", ""),
-                    "description": idea.get("description", ""),
-                    "url": idea.get("url", ""),
-                    "source": idea.get("source", ""),
-                    "timestamp": idea.get("timestamp", datetime.datetime.now().isoformat()),
-                    "hash": idea.get("hash", ""),
-                    "analysis": analysis,
-                    "score": analysis.get("score", 0),
-                    "tags": analysis.get("tags", []),
-                    "difficulty": analysis.get("difficulty", "medium"),
-                    "market_potential": analysis.get("market_potential", "moderate")
-                }
-                
-                # Inserisci l'idea
-                result = self.supabase.table("analyzed_ideas").insert(idea_data).execute()
-                
-                if result.data:
-                    count += 1
-                
-            except Exception as e:
-                logger.error(f"Errore nell'archiviazione dell'idea analizzata in Supabase: {str(e)}")
+            analysis = idea.get("analysis", {})
+            
+            # Prepara i dati per l'inserimento
+            rows.append({
+                "title": idea.get("title", ""),
+                "description": idea.get("description", ""),
+                "url": idea.get("url", ""),
+                "source": idea.get("source", ""),
+                "timestamp": idea.get("timestamp", now_iso),
+                "hash": idea.get("hash", ""),
+                "analysis": analysis,
+                "score": analysis.get("score", 0),
+                "tags": analysis.get("tags", []),
+                "difficulty": analysis.get("difficulty", "medium"),
+                "market_potential": analysis.get("market_potential", "moderate")
+            })
+        
+        # Le idee già presenti (stesso hash) vengono aggiornate
+        count = self._upsert_supabase("analyzed_ideas", rows)
         
         logger.success(f"Archiviate {count}/{len(ideas)} idee analizzate in Supabase")
         return count
@@ -397,42 +677,29 @@ class DatabaseManager:
         Returns:
             Numero di idee archiviate
         """
-        cursor = self.conn.cursor()
-        count = 0
+        # Timestamp di ripiego calcolato una sola volta per l'intero blocco
+        now_iso = datetime.datetime.now().isoformat()
         
+        rows = []
         for idea in ideas:
-            try:
-                analysis = idea.get("analysis", {})
-                
-                # Converti tags in stringa JSON
-                tags = json.dumps(analysis.get("tags", []))
-                
-                # Inserisci l'idea
-                cursor.execute("""
-                INSERT OR REPLACE INTO analyzed_ideas 
-                (title, description, url, source, timestamp, hash, analysis, score, tags, difficulty, market_potential)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    idea.get("title", ""),
-                    idea.get("description", ""),
-                    idea.get("url", ""),
-                    idea.get("source", ""),
-                    idea.get("timestamp", datetime.datetime.now().isoformat()),
-                    idea.get("hash", ""),
-                    json.dumps(analysis),
-                    analysis.get("score", 0),
-                    tags,
-                    analysis.get("difficulty", "medium"),
-                    analysis.get("market_potential", "moderate")
-                ))
-                
-                if cursor.rowcount > 0:
-                    count += 1
-                
-            except Exception as e:
-                logger.error(f"Errore nell'archiviazione dell'idea analizzata in SQLite: {str(e)}")
+            analysis = idea.get("analysis", {})
+            
+            rows.append((
+                idea.get("title", ""),
+                idea.get("description", ""),
+                idea.get("url", ""),
+                idea.get("source", ""),
+                idea.get("timestamp", now_iso),
+                idea.get("hash", ""),
+                orjson.dumps(analysis).decode(),
+                analysis.get("score", 0),
+                orjson.dumps(analysis.get("tags", [])).decode(),  # Converti tags in stringa JSON
+                analysis.get("difficulty", "medium"),
+                analysis.get("market_potential", "moderate")
+            ))
+        
+        count = self._executemany_sqlite(self._SQL_UPSERT_ANALYZED, rows)
         
-        self.conn.commit()
         logger.success(f"Archiviate {count}/{len(ideas)} idee analizzate in SQLite")
         return count
     
@@ -493,12 +760,7 @@ class DatabaseManager:
         cursor = self.conn.cursor()
         
         try:
-            cursor.execute("""
-            SELECT * FROM analyzed_ideas 
-            WHERE score >= ? 
-            ORDER BY score DESC 
-            LIMIT ?
-            """, (min_score, limit))
+            cursor.execute(self._SQL_SELECT_TOP, (min_score, limit))
             
             # Converti i risultati in dizionari
             ideas = []
@@ -507,10 +769,10 @@ class DatabaseManager:
                 
                 # Converti JSON strings in oggetti Python
                 if "analysis" in idea and isinstance(idea["analysis"], str):
-                    idea["analysis"] = json.loads(idea["analysis"])
+                    idea["analysis"] = orjson.loads(idea["analysis"])
                 
                 if "tags" in idea and isinstance(idea["tags"], str):
-                    idea["tags"] = json.loads(idea["tags"])
+                    idea["tags"] = orjson.loads(idea["tags"])
                 
                 ideas.append(idea)
             
@@ -520,6 +782,87 @@ class DatabaseManager:
             logger.error(f"Errore nel recupero delle idee da SQLite: {str(e)}")
             return []
     
+    def get_analyses_by_hash(self, hashes):
+        """
+        Recupera le analisi già archiviate per un insieme di hash.
+        
+        Args:
+            hashes: Lista di hash delle idee
+            
+        Returns:
+            Dizionario hash -> analisi
+        """
+        hashes = list({h for h in hashes if h})
+        if not hashes:
+            return {}
+        
+        logger.info(f"Recupero delle analisi esistenti per {len(hashes)} hash")
+        
+        if self.db_type == "supabase":
+            return self._get_analyses_by_hash_supabase(hashes)
+        else:
+            return self._get_analyses_by_hash_sqlite(hashes)
+    
+    def _get_analyses_by_hash_supabase(self, hashes, chunk_size=500):
+        """
+        Recupera le analisi esistenti da Supabase.
+        
+        Args:
+            hashes: Lista di hash
+            chunk_size: Numero massimo di hash per richiesta
+            
+        Returns:
+            Dizionario hash -> analisi
+        """
+        analyses = {}
+        
+        try:
+            for i in range(0, len(hashes), chunk_size):
+                result = self.supabase.table("analyzed_ideas") \
+                    .select("hash,analysis") \
+                    .in_("hash", hashes[i:i+chunk_size]) \
+                    .execute()
+                
+                for row in result.data or []:
+                    analyses[row["hash"]] = row["analysis"]
+            
+        except Exception as e:
+            logger.error(f"Errore nel recupero delle analisi da Supabase: {str(e)}")
+        
+        return analyses
+    
+    def _get_analyses_by_hash_sqlite(self, hashes, chunk_size=500):
+        """
+        Recupera le analisi esistenti da SQLite.
+        
+        Args:
+            hashes: Lista di hash
+            chunk_size: Numero massimo di hash per query (limite parametri SQLite)
+            
+        Returns:
+            Dizionario hash -> analisi
+        """
+        cursor = self.conn.cursor()
+        analyses = {}
+        
+        try:
+            for i in range(0, len(hashes), chunk_size):
+                chunk = hashes[i:i+chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"""
+                SELECT hash, analysis FROM analyzed_ideas 
+                WHERE hash IN ({placeholders})
+                """, chunk)
+                
+                for row in cursor.fetchall():
+                    if row["analysis"]:
+                        analyses[row["hash"]] = orjson.loads(row["analysis"])
+            
+        except Exception as e:
+            logger.error(f"Errore nel recupero delle analisi da SQLite: {str(e)}")
+        
+        return analyses
+    
     def cleanup_old_raw_ideas(self, days=30):
         """
         Rimuove le idee grezze più vecchie di un certo numero di giorni.
@@ -578,18 +921,20 @@ class DatabaseManager:
         cursor = self.conn.cursor()
         
         try:
-            # Calcola la data limite
-            cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+            # Calcola la data limite. created_at è scritto da CURRENT_TIMESTAMP in UTC
+            # come "YYYY-MM-DD HH:MM:SS": il confronto tra stringhe con "YYYY-MM-DD"
+            # equivale a date(created_at) < date(?) ma può usare l'indice su created_at
+            cutoff_date = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
             
             # Rimuovi le idee più vecchie
-            cursor.execute("""
-            DELETE FROM raw_ideas 
-            WHERE date(created_at) < date(?)
-            """, (cutoff_date,))
+            cursor.execute(self._SQL_DELETE_OLD_RAW, (cutoff_date,))
             
             count = cursor.rowcount
             self.conn.commit()
             
+            if count:
+                self._known_raw_hashes = None
+            
             logger.success(f"Rimosse {count} idee grezze vecchie da SQLite")
             return count
             
@@ -597,9 +942,37 @@ class DatabaseManager:
             logger.error(f"Errore nella pulizia delle idee da SQLite: {str(e)}")
             return 0
     
+    def backup_sqlite(self, backup_file):
+        """
+        Crea una copia consistente del database SQLite tramite l'API di backup online,
+        sicura anche in modalità WAL e con letture concorrenti.
+        
+        Args:
+            backup_file: Percorso del file di backup
+            
+        Returns:
+            True se il backup è riuscito, False altrimenti
+        """
+        dest = sqlite3.connect(backup_file)
+        
+        try:
+            with dest:
+                self.conn.backup(dest, pages=1000, sleep=0.001)
+            
+            logger.info(f"Backup del database creato: {backup_file}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Errore nel backup del database SQLite: {str(e)}")
+            return False
+            
+        finally:
+            dest.close()
+    
     def close(self):
         """
         Chiude la connessione al database.
+        Il client Supabase è condiviso tra le istanze e resta aperto.
         """
         if self.db_type == "sqlite" and hasattr(self, "conn"):
             self.conn.close()
@@ -627,20 +1000,29 @@ def main():
             logger.error("Nessun file di idee processate trovato")
             return
         
-        # Ordina per data di modifica (più recente prima)
-        latest_file = str(sorted(processed_files, key=lambda x: x.stat().st_mtime, reverse=True)[0])
+        # Il nome contiene il timestamp: il massimo lessicografico è il file più recente
+        latest_file = str(max(processed_files, key=lambda x: x.name))
         
-        # Carica le idee processate
-        with open(latest_file, "r", encoding="utf-8") as f:
-            processed_ideas = json.load(f)
+        # Legge le idee processate in streaming e le archivia a blocchi,
+        # senza caricare in memoria l'intero file
+        total = 0
+        batch = []
         
-        logger.info(f"Caricate {len(processed_ideas)} idee processate da {latest_file}")
+        with open(latest_file, "rb") as f:
+            for idea in ijson.items(f, "item", use_float=True):
+                batch.append(idea)
+                if len(batch) == STORE_BATCH_SIZE:
+                    db_manager.store_raw_ideas(batch)
+                    db_manager.store_analyzed_ideas(batch)
+                    total += len(batch)
+                    batch = []
         
-        # Archivia le idee grezze
-        db_manager.store_raw_ideas(processed_ideas)
+        if batch:
+            db_manager.store_raw_ideas(batch)
+            db_manager.store_analyzed_ideas(batch)
+            total += len(batch)
         
-        # Archivia le idee analizzate
-        db_manager.store_analyzed_ideas(processed_ideas)
+        logger.info(f"Archiviate {total} idee processate da {latest_file}")
         
         # Pulizia delle idee grezze vecchie
         db_manager.cleanup_old_raw_ideas()
@@ -648,8 +1030,7 @@ def main():
         # Backup del database SQLite
         if db_manager.db_type == "sqlite":
             backup_file = os.path.join(DATA_DIR, f"backup_ideas_{datetime.datetime.now().strftime('%Y%m%d')}.db")
-            os.system(f"copy {db_manager.db_path} {backup_file}")
-            logger.info(f"Backup del database creato: {backup_file}")
+            db_manager.backup_sqlite(backup_file)
         
         logger.success("Processo di archiviazione completato con successo")
         
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP condiviso
+Sessione HTTP unica per tutti gli scraper, così le connessioni keep-alive
+e gli handshake TLS vengono riusati tra scraper e richieste diverse.
+"""
+
+import atexit
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Numero massimo di connessioni mantenute aperte per host
+POOL_MAXSIZE = 32
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Restituisce la sessione HTTP condivisa, creandola al primo utilizzo.
+
+    Returns:
+        Sessione requests con pool di connessioni
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                # Chiude le connessioni keep-alive all'uscita del processo
+                atexit.register(close_session)
+
+    return _session
+
+
+def close_session() -> None:
+    """
+    Chiude la sessione HTTP condivisa e le sue connessioni.
+    Una chiamata successiva a get_session() ne crea una nuova.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -8,18 +8,20 @@ Coordina l'esecuzione di tutti gli scraper e gestisce il flusso di lavoro comple
 
 import os
 import sys
-import json
 import time
 import logging
-import hashlib
 from datetime import datetime
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configurazione logging
 import logging
 from loguru import logger
 
+# Serializzazione JSON e hashing veloci
+import orjson
+import xxhash
+
 # Importazione scraper
 from scrapers.producthunt import ProductHuntScraper
 from scrapers.reddit import RedditScraper
@@ -53,20 +55,46 @@ def normalize_data(data, source):
     Returns:
         dict: Dati normalizzati
     """
-    # Genera un hash unico per deduplicazione
-    content_hash = hashlib.md5(
-        f"{data.get('title', '')}{data.get('description', '')}".encode()
-    ).hexdigest()
+    return normalize_batch([data], source)[0]
+
+
+def normalize_batch(raw_list, source):
+    """
+    Normalizza una lista di dati grezzi nel formato JSON unificato.
+    Il timestamp viene calcolato una sola volta per l'intero blocco.
     
-    return {
-        "title": data.get("title", ""),
-        "description": data.get("description", ""),
-        "url": data.get("url", ""),
-        "source": source,
-        "timestamp": datetime.now().isoformat(),
-        "raw_content": json.dumps(data),  # Salva i dati grezzi come JSON
-        "hash": content_hash
-    }
+    Args:
+        raw_list (list): Dati grezzi dallo scraper
+        source (str): Nome della fonte
+        
+    Returns:
+        list: Dati normalizzati
+    """
+    timestamp = datetime.now().isoformat()
+    hexdigest = xxhash.xxh3_64_hexdigest
+    
+    normalized = []
+    append = normalized.append
+    
+    for data in raw_list:
+        title = data.get("title", "")
+        description = data.get("description", "")
+        
+        append({
+            "title": title,
+            "description": description,
+            "url": data.get("url", ""),
+            "source": source,
+            "timestamp": timestamp,
+            # I dati grezzi restano un dict: vengono serializzati una sola volta,
+            # nel file di output o dal backend del database
+            "raw_content": data,
+            # Hash unico per deduplicazione (non crittografico: basta che sia veloce).
+            # Il separatore evita collisioni tra "ab" + "c" e "a" + "bc"
+            "hash": hexdigest(f"{title}\x1f{description}".encode("utf-8", "replace"))
+        })
+    
+    return normalized
 
 
 def run_scraper(scraper_class, config):
@@ -96,9 +124,7 @@ def run_scraper(scraper_class, config):
         raw_ideas = scraper.run()
         
         # Normalizza i dati
-        normalized_ideas = [
-            normalize_data(idea, source_name) for idea in raw_ideas
-        ]
+        normalized_ideas = normalize_batch(raw_ideas, source_name)
         
         logger.success(f"Scraper {source_name} completato: {len(normalized_ideas)} idee raccolte")
         return normalized_ideas
@@ -125,22 +151,26 @@ def main():
     
     all_ideas = []
     
-    # Esegui gli scraper in parallelo
-    with ThreadPoolExecutor(max_workers=3) as executor:
+    # Esegui gli scraper in parallelo: sono vincolati dalla rete verso host
+    # indipendenti, quindi conviene un thread per scraper
+    max_workers = min(len(scraper_map), (os.cpu_count() or 4) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_scraper = {
             executor.submit(run_scraper, scraper_map[name], config): name
             for name, config in SCRAPER_CONFIG.items()
             if name in scraper_map
         }
         
-        for future in future_to_scraper:
+        # Raccoglie i risultati man mano che gli scraper terminano,
+        # senza attendere quelli lenti lanciati per primi
+        for future in as_completed(future_to_scraper):
             ideas = future.result()
             all_ideas.extend(ideas)
     
     # Salva i risultati
     output_file = os.path.join(DATA_DIR, f"raw_ideas_{datetime.now().strftime('%Y%m%d')}.json")
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_ideas, f, ensure_ascii=False, indent=2)
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(all_ideas, option=orjson.OPT_INDENT_2))
     
     logger.info(f"Scraping completato. Totale idee raccolte: {len(all_ideas)}")
     logger.info(f"Risultati salvati in: {output_file}")
@@ -3,27 +3,178 @@
 
 """
 Reddit Scraper
-Raccoglie idee di business da subreddit specifici utilizzando l'API ufficiale di Reddit tramite PRAW.
+Raccoglie idee di business da subreddit specifici utilizzando gli endpoint JSON dell'API di Reddit.
 """
 
 import os
 import time
-import json
-import praw
+import sqlite3
+import threading
 import backoff
+import orjson
+import requests
 from loguru import logger
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from rapidfuzz import fuzz, process
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapers._http import get_session
+
+# Host di Reddit: pubblico (anche per i permalink) e per le richieste OAuth
+_REDDIT_BASE = "https://www.reddit.com"
+_REDDIT_OAUTH_BASE = "https://oauth.reddit.com"
+
+# Campi dei post letti dalla classifica: il resto (media, awards, flair...) viene scartato subito
+_POST_FIELDS = ("id", "title", "selftext", "permalink", "score", "created_utc", "author", "num_comments")
+
+# Lunghezza massima (in caratteri) del testo dei commenti aggiunto a ogni post
+_COMMENTS_BUDGET = 4096
+
+# Stati HTTP temporanei per cui ha senso ritentare la richiesta
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _is_permanent_error(e: Exception) -> bool:
+    """
+    Indica se un errore HTTP è definitivo (es. 403, 404) e quindi inutile da ritentare.
+    
+    Args:
+        e: Eccezione sollevata dalla richiesta
+        
+    Returns:
+        True se non va ritentata
+    """
+    response = getattr(e, "response", None)
+    return response is not None and response.status_code not in _RETRY_STATUSES
+
+
+class _RateLimiter:
+    """
+    Limitatore di richieste guidato dagli header x-ratelimit-* restituiti da Reddit.
+    Blocca solo quando la quota della finestra corrente è esaurita; è condiviso dai thread.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = 0.0
+    
+    def update(self, headers) -> None:
+        """
+        Aggiorna la quota residua a partire dagli header di una risposta.
+        
+        Args:
+            headers: Header HTTP della risposta
+        """
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return
+        
+        with self._lock:
+            self.remaining = float(remaining)
+            self.reset_at = time.monotonic() + float(reset)
+    
+    def acquire(self) -> None:
+        """
+        Riserva una richiesta, attendendo il reset della finestra se la quota è esaurita.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.remaining is None or now >= self.reset_at:
+                # Quota sconosciuta o finestra già scaduta: nessuna attesa
+                return
+            
+            if self.remaining >= 2:
+                # Scala subito la richiesta, così i thread concorrenti non superano la quota
+                self.remaining -= 1
+                return
+            
+            wait = self.reset_at - now
+        
+        logger.info(f"Quota Reddit esaurita, attesa di {wait:.1f}s")
+        time.sleep(wait)
+
+
+class _ResponseCache:
+    """
+    Cache su disco (SQLite) delle risposte JSON di Reddit, con scadenza per voce.
+    Le classifiche "top" cambiano poco nell'arco di minuti: le esecuzioni ravvicinate
+    leggono dal disco invece di riscaricarle.
+    """
+    
+    def __init__(self, path: str, max_ttl: int):
+        """
+        Apre (o crea) la cache e rimuove le voci già scadute.
+        
+        Args:
+            path: Percorso del file SQLite
+            max_ttl: Durata massima di una voce in secondi
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            fetched_at INTEGER NOT NULL
+        )
+        """)
+        self._conn.execute("DELETE FROM responses WHERE fetched_at < ?", (int(time.time()) - max_ttl,))
+        self._conn.commit()
+    
+    def get(self, url: str, ttl: int) -> Optional[bytes]:
+        """
+        Restituisce il corpo salvato per un URL se non è più vecchio di ttl secondi.
+        
+        Args:
+            url: URL della richiesta (chiave della cache)
+            ttl: Durata di validità in secondi
+            
+        Returns:
+            Corpo della risposta, oppure None se assente o scaduto
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM responses WHERE url = ? AND fetched_at >= ?",
+                (url, int(time.time()) - ttl)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def set(self, url: str, body: bytes) -> None:
+        """
+        Salva il corpo di una risposta.
+        
+        Args:
+            url: URL della richiesta (chiave della cache)
+            body: Corpo della risposta
+        """
+        with self._lock:
+            self._conn.execute("""
+            INSERT INTO responses (url, body, fetched_at) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET body = excluded.body, fetched_at = excluded.fetched_at
+            """, (url, body, int(time.time())))
+            self._conn.commit()
 
 
 class RedditScraper:
     """
     Scraper per raccogliere idee di business da subreddit specifici.
-    Utilizza PRAW per interagire con l'API di Reddit in modo sicuro e rispettoso dei rate limit.
+    Interroga direttamente gli endpoint JSON di Reddit sulla sessione HTTP condivisa:
+    con le credenziali dell'app usa OAuth (solo lettura), altrimenti gli endpoint pubblici.
     """
     
     def __init__(self, subreddits: List[str], time_filter: str = "week", 
-                 limit: int = 100, min_score: int = 10):
+                 limit: int = 100, min_score: int = 10, max_workers: int = 8,
+                 session: Optional[requests.Session] = None, timeout: float = 10.0,
+                 include_comments: bool = False, comment_workers: int = 4,
+                 cache_path: Optional[str] = None, listing_ttl: int = 900,
+                 comments_ttl: int = 3600, dedup: bool = False,
+                 dedup_threshold: float = 0.95):
         """
         Inizializza lo scraper di Reddit.
         
@@ -32,27 +183,181 @@ class RedditScraper:
             time_filter: Filtro temporale (hour, day, week, month, year, all)
             limit: Numero massimo di post da raccogliere per subreddit
             min_score: Punteggio minimo (upvotes) per considerare un post
+            max_workers: Numero di subreddit raccolti in parallelo
+            session: Sessione HTTP da usare (default: quella condivisa tra gli scraper)
+            timeout: Timeout in secondi per ogni richiesta HTTP
+            include_comments: Aggiunge alla descrizione i commenti principali (una richiesta in più per post)
+            comment_workers: Richieste di commenti contemporanee per ogni subreddit
+            cache_path: File SQLite per la cache delle risposte (None per disattivarla)
+            listing_ttl: Validità in secondi delle classifiche in cache
+            comments_ttl: Validità in secondi dei commenti in cache
+            dedup: Scarta i post quasi identici a uno già raccolto (repost e crosspost)
+            dedup_threshold: Similarità minima (0-1) per considerare due post duplicati
         """
         self.subreddits = subreddits
         self.time_filter = time_filter
         self.limit = limit
         self.min_score = min_score
+        self.max_workers = max(1, max_workers)
+        # La sessione resta aperta tra un run() e l'altro, così le connessioni keep-alive
+        # verso Reddit vengono riusate invece di rifare ogni volta l'handshake TLS
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.include_comments = include_comments
+        self.comment_workers = max(1, comment_workers)
+        
+        self.client_id = os.environ.get("REDDIT_CLIENT_ID")
+        self.client_secret = os.environ.get("REDDIT_CLIENT_SECRET")
+        self.user_agent = os.environ.get("REDDIT_USER_AGENT", "IdeaAggregator/1.0")
         
-        # Inizializza il client Reddit
+        # Token OAuth app-only, condiviso dai thread e rinnovato alla scadenza
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        
+        self._rate_limiter = _RateLimiter()
+        
+        self.listing_ttl = listing_ttl
+        self.comments_ttl = comments_ttl
+        self._cache = _ResponseCache(cache_path, max(listing_ttl, comments_ttl)) if cache_path else None
+        
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        
+        # Risultati dell'ultima esecuzione, usati da dump()
+        self.last_posts = []
+        
+        if self.client_id and self.client_secret:
+            logger.info(f"Reddit client inizializzato con successo")
+            
+            # Richiede subito il token OAuth, così l'handshake non ritarda la prima
+            # richiesta di un subreddit; in caso di errore verrà richiesto al primo uso
+            try:
+                self._get_token()
+            except Exception as e:
+                logger.warning(f"Impossibile ottenere in anticipo il token Reddit: {str(e)}")
+        else:
+            logger.warning("Credenziali Reddit mancanti: uso degli endpoint pubblici con limiti più bassi")
+    
+    def _get_token(self) -> str:
+        """
+        Restituisce il token OAuth app-only, richiedendone uno nuovo se scaduto.
+        
+        Returns:
+            Token di accesso
+        """
+        with self._token_lock:
+            if self._token is None or time.time() >= self._token_expires_at:
+                response = self.session.post(
+                    _REDDIT_BASE + "/api/v1/access_token",
+                    data={"grant_type": "client_credentials"},
+                    auth=(self.client_id, self.client_secret),
+                    headers={"User-Agent": self.user_agent},
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                payload = orjson.loads(response.content)
+                
+                self._token = payload["access_token"]
+                # Rinnova con un minuto di anticipo rispetto alla scadenza
+                self._token_expires_at = time.time() + payload.get("expires_in", 3600) - 60
+            
+            return self._token
+    
+    def _api_get(self, path: str, params: Dict[str, Any], ttl: int = 0) -> Any:
+        """
+        Esegue una GET su un endpoint JSON di Reddit.
+        
+        Args:
+            path: Percorso dell'endpoint (es. /r/SaaS/top.json)
+            params: Parametri della query
+            ttl: Validità in secondi della risposta in cache (0 per non usare la cache)
+            
+        Returns:
+            Risposta JSON decodificata
+        """
+        # La chiave non dipende dall'host: OAuth e endpoint pubblici restituiscono gli stessi dati
+        cache_key = None
+        if self._cache and ttl > 0:
+            cache_key = f"{path}?{urlencode(sorted(params.items()))}"
+            body = self._cache.get(cache_key, ttl)
+            if body is not None:
+                return orjson.loads(body)
+        
+        headers = {"User-Agent": self.user_agent}
+        
+        if self.client_id and self.client_secret:
+            base_url = _REDDIT_OAUTH_BASE
+            headers["Authorization"] = f"bearer {self._get_token()}"
+        else:
+            base_url = _REDDIT_BASE
+        
+        self._rate_limiter.acquire()
+        
+        # raw_json=1 evita l'escaping HTML di titoli e testi
+        response = self.session.get(
+            base_url + path,
+            params={**params, "raw_json": 1},
+            headers=headers,
+            timeout=self.timeout
+        )
+        self._rate_limiter.update(response.headers)
+        response.raise_for_status()
+        # orjson decodifica le risposte (da decine a centinaia di KB) molto più
+        # velocemente di json; si leggono solo i campi necessari, senza oggetti intermedi
+        data = orjson.loads(response.content)
+        
+        if cache_key:
+            self._cache.set(cache_key, response.content)
+        
+        return data
+    
+    def _fetch_top_comments(self, post_id: str) -> str:
+        """
+        Raccoglie i commenti principali di un post (solo i primi 5 più votati).
+        
+        Args:
+            post_id: ID del post
+            
+        Returns:
+            Testo dei commenti con punteggio sufficiente (vuoto in caso di errore)
+        """
+        # I commenti sono testo aggiuntivo: un errore su un singolo thread (di rete,
+        # corpo non JSON o struttura inattesa) non deve far fallire (e ritentare)
+        # la raccolta dell'intero subreddit
         try:
-            self.reddit = praw.Reddit(
-                client_id=os.environ.get("REDDIT_CLIENT_ID"),
-                client_secret=os.environ.get("REDDIT_CLIENT_SECRET"),
-                user_agent=os.environ.get("REDDIT_USER_AGENT", "IdeaAggregator/1.0")
+            # La risposta contiene due listing: il post e i suoi commenti
+            listings = self._api_get(
+                f"/comments/{post_id}.json",
+                {"sort": "top", "limit": 5, "depth": 1},
+                ttl=self.comments_ttl
             )
-            logger.info(f"Reddit client inizializzato con successo")
-        except Exception as e:
-            logger.error(f"Errore nell'inizializzazione del client Reddit: {str(e)}")
-            raise
+            comments = [
+                child["data"] for child in listings[1]["data"]["children"]
+                if child.get("kind") == "t1"
+            ]
+        except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+            logger.warning(f"Impossibile raccogliere i commenti del post {post_id}: {str(e)}")
+            return ""
+        
+        # Limite complessivo al testo dei commenti: un commento enorme non deve
+        # gonfiare la descrizione (e il costo delle analisi successive)
+        budget = _COMMENTS_BUDGET
+        top_parts = []
+        for i, comment in enumerate(comments[:5]):
+            if comment.get("body") and comment.get("score", 0) > 5:
+                part = f"\n---\nCommento {i+1}: {comment['body']}"[:budget]
+                top_parts.append(part)
+                budget -= len(part)
+                if budget <= 0:
+                    break
+        
+        return "".join(top_parts)
     
     @backoff.on_exception(backoff.expo, 
-                          (praw.exceptions.PRAWException, Exception),
-                          max_tries=3)
+                          requests.RequestException,
+                          max_tries=5,
+                          giveup=_is_permanent_error)
     def _fetch_subreddit_posts(self, subreddit_name: str) -> List[Dict[str, Any]]:
         """
         Raccoglie i post da un subreddit specifico con gestione degli errori e retry.
@@ -67,46 +372,61 @@ class RedditScraper:
         posts = []
         
         try:
-            subreddit = self.reddit.subreddit(subreddit_name)
-            
-            # Ottieni i post in base al filtro temporale
-            if self.time_filter == "all":
-                submissions = subreddit.top(limit=self.limit)
-            else:
-                submissions = subreddit.top(time_filter=self.time_filter, limit=self.limit)
-            
-            for post in submissions:
-                # Salta i post con punteggio troppo basso
-                if post.score < self.min_score:
-                    continue
-                    
-                # Estrai il testo completo (post + commenti principali)
-                post_text = post.selftext if hasattr(post, 'selftext') else ""
+            # Ottieni i post in base al filtro temporale, a pagine di al massimo 100
+            # seguendo il cursore "after": ogni pagina contiene già tutti i campi necessari
+            children = []
+            after = None
+            while len(children) < self.limit:
+                params = {"t": self.time_filter, "limit": min(self.limit - len(children), 100)}
+                if after:
+                    params["after"] = after
+                
+                listing = self._api_get(f"/r/{subreddit_name}/top.json", params, ttl=self.listing_ttl)
+                page = listing["data"]["children"]
+                children.extend(page)
                 
-                # Raccogli i commenti principali (solo i primi 5 più votati)
-                top_comments = ""
-                post.comment_sort = "top"
-                post.comments.replace_more(limit=0)  # Non caricare commenti aggiuntivi
-                for i, comment in enumerate(post.comments[:5]):
-                    if hasattr(comment, 'body') and comment.score > 5:
-                        top_comments += f"\n---\nCommento {i+1}: {comment.body}"
+                after = listing["data"].get("after")
+                if not page or not after:
+                    break
+            
+            # Salta i post con punteggio troppo basso e tiene solo i campi necessari,
+            # così i dizionari completi della risposta possono essere liberati
+            selected = [
+                {field: data[field] for field in _POST_FIELDS if field in data}
+                for data in (child["data"] for child in children)
+                if data.get("score", 0) >= self.min_score
+            ]
+            del children
+            
+            # I commenti richiedono una richiesta per post: solo se servono ed esistono.
+            # Le richieste vengono sovrapposte, con un limite di richieste contemporanee
+            comments_by_id = {}
+            if self.include_comments:
+                post_ids = [post["id"] for post in selected if post.get("num_comments", 0) > 0]
+                if post_ids:
+                    with ThreadPoolExecutor(max_workers=min(self.comment_workers, len(post_ids))) as executor:
+                        comments_by_id = dict(zip(post_ids, executor.map(self._fetch_top_comments, post_ids)))
+            
+            posts_append = posts.append
+            for post in selected:
+                # Estrai il testo completo (post + commenti principali)
+                post_text = post.get("selftext") or ""
+                top_comments = comments_by_id.get(post["id"], "")
                 
                 # Crea l'oggetto post
                 post_data = {
-                    "title": post.title,
-                    "description": post_text + top_comments if post_text else top_comments,
-                    "url": f"https://www.reddit.com{post.permalink}",
-                    "score": post.score,
-                    "created_utc": datetime.fromtimestamp(post.created_utc).isoformat(),
-                    "author": str(post.author) if post.author else "[deleted]",
+                    "title": post.get("title", ""),
+                    "description": f"{post_text}{top_comments}",
+                    "url": _REDDIT_BASE + post["permalink"],
+                    "score": post.get("score", 0),
+                    # Epoch in secondi, come fornito da Reddit: nessuna conversione per post
+                    "created_utc": int(post.get("created_utc", 0)),
+                    "author": post.get("author") or "[deleted]",
                     "subreddit": subreddit_name,
-                    "num_comments": post.num_comments
+                    "num_comments": post.get("num_comments", 0)
                 }
                 
-                posts.append(post_data)
-                
-                # Rispetta i rate limit
-                time.sleep(0.5)
+                posts_append(post_data)
                 
             logger.success(f"Raccolti {len(posts)} post da r/{subreddit_name}")
             return posts
@@ -115,6 +435,22 @@ class RedditScraper:
             logger.error(f"Errore durante la raccolta da r/{subreddit_name}: {str(e)}")
             raise
     
+    def _collect_subreddit(self, subreddit: str) -> List[Dict[str, Any]]:
+        """
+        Raccoglie i post di un subreddit senza propagare gli errori.
+        
+        Args:
+            subreddit: Nome del subreddit
+            
+        Returns:
+            Lista di post raccolti (vuota in caso di errore)
+        """
+        try:
+            return self._fetch_subreddit_posts(subreddit)
+        except Exception as e:
+            logger.error(f"Impossibile raccogliere post da r/{subreddit}: {str(e)}")
+            return []
+    
     def run(self) -> List[Dict[str, Any]]:
         """
         Esegue lo scraper su tutti i subreddit configurati.
@@ -123,19 +459,69 @@ class RedditScraper:
             Lista di idee raccolte da tutti i subreddit
         """
         all_posts = []
+        all_posts_extend = all_posts.extend
         
-        for subreddit in self.subreddits:
-            try:
-                posts = self._fetch_subreddit_posts(subreddit)
-                all_posts.extend(posts)
-                # Pausa tra subreddit per rispettare i rate limit
-                time.sleep(2)
-            except Exception as e:
-                logger.error(f"Impossibile raccogliere post da r/{subreddit}: {str(e)}")
-                continue
+        # I subreddit sono indipendenti: le richieste vengono sovrapposte
+        # sulle connessioni keep-alive della sessione condivisa
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.subreddits) or 1)) as executor:
+            for posts in executor.map(self._collect_subreddit, self.subreddits):
+                all_posts_extend(posts)
+        
+        if self.dedup:
+            all_posts = self._drop_near_duplicates(all_posts)
+        
+        self.last_posts = all_posts
         
         logger.info(f"Scraping Reddit completato. Raccolti {len(all_posts)} post totali")
         return all_posts
+    
+    def dump(self, path: str, posts: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Salva i post raccolti in un file JSON.
+        
+        Args:
+            path: Percorso del file di output
+            posts: Post da salvare (default: quelli dell'ultimo run())
+        """
+        if posts is None:
+            posts = self.last_posts
+        
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(posts, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NAIVE_UTC))
+        
+        logger.info(f"Salvati {len(posts)} post Reddit in {path}")
+    
+    def _drop_near_duplicates(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Rimuove i post quasi identici a uno precedente (repost e crosspost tra subreddit),
+        così le fasi successive non analizzano più volte lo stesso contenuto.
+        
+        Args:
+            posts: Lista di post raccolti
+            
+        Returns:
+            Lista di post senza quasi-duplicati, nell'ordine originale
+        """
+        cutoff = self.dedup_threshold * 100
+        seen_keys = set()
+        kept_keys = []
+        unique_posts = []
+        
+        for post in posts:
+            key = f"{post['title']} {post['description'][:200]}".lower()
+            
+            # Confronto esatto prima, fuzzy solo se necessario
+            if key in seen_keys or process.extractOne(key, kept_keys, scorer=fuzz.ratio, score_cutoff=cutoff):
+                continue
+            
+            seen_keys.add(key)
+            kept_keys.append(key)
+            unique_posts.append(post)
+        
+        if len(unique_posts) < len(posts):
+            logger.info(f"Scartati {len(posts) - len(unique_posts)} post Reddit quasi duplicati")
+        
+        return unique_posts
 
 
 # Test dello scraper se eseguito direttamente
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test della deduplicazione fuzzy del processor.
+"""
+
+import random
+
+from rapidfuzz import fuzz
+
+from analysis.process import IdeaProcessor, _bucket_key
+
+
+def _processor(threshold: float = 0.85) -> IdeaProcessor:
+    # Nessuna connessione a Ollama: serve solo la deduplicazione
+    processor = IdeaProcessor.__new__(IdeaProcessor)
+    processor.similarity_threshold = threshold
+    return processor
+
+
+def _all_pairs_dedup(ideas, threshold):
+    """Confronto completo con la media ponderata, coppia per coppia."""
+    unique = []
+    for idea in ideas:
+        if not any(
+            fuzz.ratio(idea["title"], other["title"]) * 0.7
+            + fuzz.ratio(idea["description"][:200], other["description"][:200]) * 0.3
+            >= threshold * 100
+            for other in unique
+        ):
+            unique.append(idea)
+    return unique
+
+
+def test_pair_exactly_at_threshold_is_duplicate():
+    # Titoli con ratio 78.5714... e descrizioni identiche: la media ponderata vale esattamente 85
+    ideas = [
+        {"title": "App ricetteABC", "description": "Un'app che suggerisce ricette"},
+        {"title": "App ricetteXYZ", "description": "Un'app che suggerisce ricette"},
+    ]
+
+    assert _processor(0.85)._deduplicate_ideas(ideas) == ideas[:1]
+
+
+def test_matches_all_pairs_comparison_within_group():
+    rng = random.Random(42)
+
+    for _ in range(1000):
+        ideas = []
+        for _ in range(rng.randint(2, 8)):
+            # Stessa prima parola: tutte le idee finiscono nello stesso gruppo.
+            # Un alfabeto ridotto rende frequenti le coppie vicine alla soglia
+            title = "App " + "".join(rng.choice("abc") for _ in range(rng.randint(6, 12)))
+            description = "".join(rng.choice("abc") for _ in range(rng.randint(0, 12)))
+            ideas.append({"title": title, "description": description})
+
+        assert _processor(0.85)._deduplicate_ideas(ideas) == _all_pairs_dedup(ideas, 0.85)
+
+
+def test_titles_differing_in_leading_article_share_group():
+    assert _bucket_key("An app for recipes") == _bucket_key("A app for recipes") == "app"
+    assert _bucket_key("The Planner: budget") == _bucket_key("Planner - budget") == "planner"
+    assert _bucket_key("L'app per le ricette") == _bucket_key("Un'app per le ricette") == "app"
+
+
+def test_pair_across_leading_article_is_duplicate():
+    ideas = [
+        {"title": "An app for sharing recipes", "description": "Share and rate home recipes"},
+        {"title": "A app for sharing recipes", "description": "Share and rate home recipes"},
+        {"title": "The habit tracker for teams", "description": "Track team habits"},
+        {"title": "Habit tracker for teams", "description": "Track team habits"},
+    ]
+
+    assert _processor(0.85)._deduplicate_ideas(ideas) == [ideas[0], ideas[2]]
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test dello scraper di Reddit su una sessione HTTP simulata.
+"""
+
+import orjson
+import requests
+
+from scrapers.reddit import RedditScraper
+
+
+class _FakeResponse:
+    def __init__(self, content: bytes, status_code: int = 200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class _FakeSession:
+    """Restituisce una classifica con due post e, per i commenti, la risposta indicata per ID."""
+
+    def __init__(self, comments):
+        self.comments = comments
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        if "/comments/" in url:
+            post_id = url.split("/comments/")[1].split(".")[0]
+            return self.comments[post_id]
+
+        children = [
+            {"kind": "t3", "data": {"id": post_id, "title": f"Post {post_id}", "selftext": "testo",
+                                    "permalink": f"/r/test/{post_id}", "score": 50,
+                                    "created_utc": 1700000000, "author": "a", "num_comments": 3}}
+            for post_id in ("p1", "p2")
+        ]
+        return _FakeResponse(orjson.dumps({"data": {"after": None, "children": children}}))
+
+
+def _comments_body(text: str) -> bytes:
+    return orjson.dumps([
+        {"data": {"children": []}},
+        {"data": {"children": [{"kind": "t1", "data": {"body": text, "score": 10}}]}},
+    ])
+
+
+def _run(monkeypatch, bad_response):
+    monkeypatch.delenv("REDDIT_CLIENT_ID", raising=False)
+    monkeypatch.delenv("REDDIT_CLIENT_SECRET", raising=False)
+    session = _FakeSession({"p1": _FakeResponse(_comments_body("ottimo")), "p2": bad_response})
+    scraper = RedditScraper(["test"], session=session, include_comments=True)
+    return {post["url"].rsplit("/", 1)[1]: post for post in scraper.run()}
+
+
+def test_malformed_comments_body_keeps_post(monkeypatch):
+    posts = _run(monkeypatch, _FakeResponse(b"<html>Reddit is down</html>"))
+
+    assert set(posts) == {"p1", "p2"}
+    assert "ottimo" in posts["p1"]["description"]
+    assert posts["p2"]["description"] == "testo"
+
+
+def test_unexpected_comments_shape_keeps_post(monkeypatch):
+    posts = _run(monkeypatch, _FakeResponse(orjson.dumps({"error": 404})))
+
+    assert set(posts) == {"p1", "p2"}
+    assert posts["p2"]["description"] == "testo"
+
+
+def test_comments_http_error_keeps_post(monkeypatch):
+    posts = _run(monkeypatch, _FakeResponse(b"", status_code=403))
+
+    assert set(posts) == {"p1", "p2"}
+    assert posts["p2"]["description"] == "testo"
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test dell'archiviazione delle idee su SQLite.
+"""
+
+from database.store import DatabaseManager
+
+
+def _manager(tmp_path) -> DatabaseManager:
+    return DatabaseManager({"type": "sqlite", "sqlite": {"db_path": str(tmp_path / "ideas.db")}})
+
+
+def _idea(n, title=None):
+    return {"title": title if title is not None else f"Idea {n}", "description": "d",
+            "url": f"https://example.com/{n}", "source": "test", "hash": f"h{n}"}
+
+
+def test_invalid_row_does_not_drop_rest_of_batch(tmp_path):
+    db = _manager(tmp_path)
+    ideas = [_idea(n) for n in range(10)]
+    # title NOT NULL: solo questa riga deve essere scartata
+    ideas[4]["title"] = None
+
+    assert db.store_raw_ideas(ideas) == 9
+
+    hashes = {row[0] for row in db.conn.execute("SELECT hash FROM raw_ideas")}
+    assert hashes == {f"h{n}" for n in range(10) if n != 4}
+
+
+def test_invalid_analyzed_row_does_not_drop_rest_of_batch(tmp_path):
+    db = _manager(tmp_path)
+    ideas = [dict(_idea(n), analysis={"score": 70, "tags": []}) for n in range(5)]
+    ideas[0]["title"] = None
+
+    assert db.store_analyzed_ideas(ideas) == 4
+    assert db.conn.execute("SELECT COUNT(*) FROM analyzed_ideas").fetchone()[0] == 4
+
+
+def test_stored_batch_skips_known_hashes(tmp_path):
+    db = _manager(tmp_path)
+    ideas = [_idea(n) for n in range(3)]
+
+    assert db.store_raw_ideas(ideas) == 3
+    assert db.store_raw_ideas(ideas + [_idea(3)]) == 1
+
+
+class _ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class _FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.client.calls.append(("upsert", self.name, rows))
+        self.action = "upsert"
+        self.rows = rows
+        return self
+
+    def insert(self, rows):
+        self.client.calls.append(("insert", self.name, rows))
+        self.action = "insert"
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.action == "upsert" and not self.client.hash_key:
+            # Come PostgREST quando manca il vincolo UNIQUE usato da ON CONFLICT
+            raise _ApiError("42P10")
+        return type("Result", (), {"data": list(self.rows)})()
+
+
+class _FakeSupabase:
+    def __init__(self, hash_key=True):
+        self.hash_key = hash_key
+        self.calls = []
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+
+def _supabase_manager(client) -> DatabaseManager:
+    db = DatabaseManager.__new__(DatabaseManager)
+    db.db_type = "supabase"
+    db.supabase = client
+    db._tables_without_hash_key = set()
+    return db
+
+
+def test_supabase_upsert_sends_one_row_per_hash():
+    client = _FakeSupabase()
+    db = _supabase_manager(client)
+    ideas = [dict(_idea(1), analysis={"score": 10}), dict(_idea(2), analysis={"score": 20}),
+             dict(_idea(1), analysis={"score": 30})]
+
+    assert db.store_analyzed_ideas(ideas) == 2
+
+    (action, table, rows), = client.calls
+    assert action == "upsert"
+    # In aggiornamento vale l'ultima occorrenza dello stesso hash
+    assert {row["hash"]: row["score"] for row in rows} == {"h1": 30, "h2": 20}
+
+
+def test_supabase_falls_back_to_insert_without_hash_constraint():
+    client = _FakeSupabase(hash_key=False)
+    db = _supabase_manager(client)
+
+    assert db.store_raw_ideas([_idea(1), _idea(2)]) == 2
+    assert db.store_raw_ideas([_idea(3)]) == 1
+
+    assert [action for action, _, _ in client.calls] == ["upsert", "insert", "insert"]